@@ -1,19 +1,22 @@
 # app_dash.py 
 import dash
-from dash import dcc, html, dash_table, Input, Output, State, ctx
+from dash import dcc, html, Input, Output, State, ctx
 import pandas as pd
 import numpy as np
-import plotly.express as px
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pa_csv
+import os
+import xlsxwriter
 from io import BytesIO
 from datetime import datetime
+from functools import lru_cache
 
 
 # ----------------------
 # Load & prepare data
 # ----------------------
-def load_data(path="data/zhubanov_scopus_issn.xlsx", sheet="ARTICLE"):
-    df = pd.read_excel(path, sheet_name=sheet, engine="openpyxl")
-
+def prepare_data(df):
     rename_map = {
         "Автор (ы)": "authors_raw",
         "Author full names": "authors_full",
@@ -31,11 +34,11 @@ def load_data(path="data/zhubanov_scopus_issn.xlsx", sheet="ARTICLE"):
 
     # Ensure types
     if "year" in df.columns:
-        df["year"] = pd.to_numeric(df["year"], errors="coerce").astype("Int64")
+        df["year"] = pd.to_numeric(df["year"], errors="coerce").astype("Int16")
     else:
         df["year"] = pd.NA
     if "cited_by" in df.columns:
-        df["cited_by"] = pd.to_numeric(df["cited_by"], errors="coerce").fillna(0).astype(int)
+        df["cited_by"] = pd.to_numeric(df["cited_by"], errors="coerce").fillna(0).astype(np.int32)
     else:
         df["cited_by"] = 0
     if "percentile_2024" in df.columns:
@@ -43,29 +46,154 @@ def load_data(path="data/zhubanov_scopus_issn.xlsx", sheet="ARTICLE"):
     else:
         df["percentile_2024"] = pd.NA
 
+    # Arrow-backed text columns (ISSN mixes numbers and text in the sheet, so it is cast too)
+    for col in ("title", "authors_raw", "authors_full", "doi", "url", "issn"):
+        if col in df.columns:
+            df[col] = df[col].astype("string[pyarrow]")
+
+    # Low-cardinality labels
+    df["source"] = df["source"].astype("category")
+    df["quartile"] = df["quartile"].astype("category")
+
     # DOI link
-    df["doi_link"] = df.get("doi").apply(lambda x: f"https://doi.org/{str(x).strip()}" if pd.notna(x) and str(x).strip() else None)
+    doi = df["doi"].str.strip()
+    df["doi_link"] = ("https://doi.org/" + doi).where(doi.notna() & (doi != ""))
 
     # authors formatted
-    df["authors_fmt"] = df.get("authors_raw", "").astype(str).str.replace(";", "\n")
+    df["authors_fmt"] = df["authors_raw"].str.replace(";", "\n", regex=False)
+
+    # lowercase search helper: title, authors and source in one column, so a search is a single scan
+    df["_search_blob"] = (df["title"].fillna("") + "\x1f" + df["authors_raw"].fillna("") + "\x1f" +
+                          df["source"].astype("string[pyarrow]").fillna("")).str.lower()
+
+    # Default sort order ("year_desc") is the stored row order
+    df = df.sort_values("year", ascending=False, na_position="last", kind="stable").reset_index(drop=True)
+
+    return df
+
+
+# Bump when prepare_data changes the stored columns or dtypes, so old caches are not reused
+CACHE_VERSION = 3
+
+# Columns the lookups below are built from; a cache without them predates the current schema
+CACHE_COLUMNS = ("title", "authors_raw", "authors_fmt", "source", "quartile", "year", "cited_by",
+                 "percentile_2024", "doi_link", "_search_blob")
 
-    # lowercase helpers
-    df["_title_lc"] = df["title"].astype(str).str.lower()
-    df["_source_lc"] = df["source"].astype(str).str.lower()
-    df["_authors_raw_lc"] = df["authors_raw"].astype(str).str.lower()
 
+def _cache_is_current(cached):
+    if not set(CACHE_COLUMNS).issubset(cached.columns):
+        return False
+    # sort_orders["year_desc"] is the stored row order: years descending, missing years last
+    years = cached["year"].to_numpy(dtype="float64", na_value=np.nan)
+    n_known = int((~np.isnan(years)).sum())
+    return not np.isnan(years[:n_known]).any() and bool((np.diff(years[:n_known]) <= 0).all())
+
+
+def load_data(path="data/zhubanov_scopus_issn.xlsx", sheet="ARTICLE"):
+    # Prepared frame is cached next to the workbook and rebuilt whenever the xlsx is newer
+    cache_path = f"{os.path.splitext(path)[0]}.{sheet}.v{CACHE_VERSION}.parquet"
+    if os.path.exists(cache_path) and os.path.getmtime(cache_path) >= os.path.getmtime(path):
+        try:
+            cached = pd.read_parquet(cache_path, engine="pyarrow", memory_map=True)
+        except (OSError, pa.ArrowInvalid):
+            cached = None  # truncated or corrupt cache: rebuild it from the xlsx
+        if cached is not None and _cache_is_current(cached):
+            return cached
+
+    df = prepare_data(pd.read_excel(path, sheet_name=sheet, engine="openpyxl"))
+    # Write to a per-process temp file and rename it into place, so readers (and other workers)
+    # never see a half-written cache
+    tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+    try:
+        df.to_parquet(tmp_path, engine="pyarrow", compression="zstd", index=False)
+        os.replace(tmp_path, cache_path)
+    except OSError:
+        # read-only deploy or full disk: keep serving from the xlsx
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
     return df
 
 
 df = load_data()
 
 # Precompute options
-source_counts = df["source"].fillna("—").value_counts()
-source_options = [{"label": f"{s} ({int(source_counts[s])})", "value": s} for s in source_counts.index]
+source_counts = df["source"].cat.add_categories("—").fillna("—").value_counts()
+source_counts = source_counts[source_counts > 0]
 
-authors_series = df["authors_raw"].dropna().astype(str).str.split(";").explode().str.strip()
+authors_series = df["authors_raw"].dropna().str.split(";").explode().str.strip()
 author_counts = authors_series.value_counts()
-author_options = [{"label": f"{a} ({int(author_counts[a])})", "value": a} for a in author_counts.index]
+
+
+@lru_cache(maxsize=1)
+def build_options():
+    sources = tuple({"label": f"{s} ({int(source_counts[s])})", "value": s} for s in source_counts.index)
+    authors = tuple({"label": f"{a} ({int(author_counts[a])})", "value": a} for a in author_counts.index)
+    return sources, authors
+
+
+source_options, author_options = build_options()
+author_values_lc = tuple(a.lower() for a in author_counts.index)
+
+# The author dropdown ships only the most prolific authors; the rest are found via search
+AUTHOR_OPTIONS_LIMIT = 500
+
+# Row index: source -> positions of the rows where it occurs
+source_to_rows = df.groupby("source", observed=True).indices
+source_codes = df["source"].cat.codes.to_numpy()
+source_names = df["source"].cat.categories
+cited_values = df["cited_by"].to_numpy()
+
+# Flat (CSR-style) author layout: one slot per (row, author) pair
+_authors_flat = authors_series[authors_series != ""]
+author_slot_rows = _authors_flat.index.to_numpy()
+author_slot_codes, author_names = pd.factorize(_authors_flat, sort=True)
+author_slot_cites = cited_values[author_slot_rows]
+
+# Column-major view of the document x author membership matrix:
+# rows of author code c are author_rows_by_code[author_indptr[c]:author_indptr[c + 1]]
+author_rows_by_code = author_slot_rows[np.argsort(author_slot_codes, kind="stable")]
+author_indptr = np.concatenate(([0], np.cumsum(np.bincount(author_slot_codes, minlength=len(author_names)))))
+
+quartile_masks = {q: (df["quartile"] == q).to_numpy() for q in df["quartile"].cat.categories}
+year_values = df["year"].to_numpy(dtype="float64", na_value=np.nan)
+percentile_values = df["percentile_2024"].to_numpy(dtype="float64", na_value=np.nan)
+search_blob = pa.array(df["_search_blob"])
+
+
+def _build_ngram_index(texts, max_n=3):
+    postings = {}
+    for row, text in enumerate(texts):
+        for gram in {text[i:i + k] for k in range(1, max_n + 1) for i in range(len(text) - k + 1)}:
+            postings.setdefault(gram, []).append(row)
+    return {gram: np.array(rows, dtype=np.int32) for gram, rows in postings.items()}
+
+
+# Inverted index: every 1-, 2- and 3-character substring -> sorted positions of the rows
+# whose search blob contains it
+search_ngrams = _build_ngram_index(df["_search_blob"].tolist())
+
+
+def _sort_order(by, ascending):
+    # Stable, NA-last permutation: rank the values, then lexsort with "is missing" as the primary key
+    codes, _ = pd.factorize(df[by], sort=True)
+    return np.lexsort((codes if ascending else -codes, codes < 0))
+
+
+# Row positions for every sort option; ties keep the year_desc row order
+sort_orders = {
+    "year_desc": np.arange(len(df)),
+    "year_asc": _sort_order("year", True),
+    "cited_desc": _sort_order("cited_by", False),
+    "cited_asc": _sort_order("cited_by", True),
+    "pct_desc": _sort_order("percentile_2024", False),
+    "author_az": _sort_order("authors_raw", True),
+    "author_za": _sort_order("authors_raw", False),
+    "source_az": _sort_order("source", True),
+    "source_za": _sort_order("source", False),
+    "title_az": _sort_order("title", True),
+}
 
 # ----------------------
 # Dash App
@@ -74,6 +202,28 @@ app = dash.Dash(__name__, suppress_callback_exceptions=True)
 app.title = "Zh Scopus — Жубанов"
 server = app.server
 
+TABLE_PAGE_SIZE = 20
+CARDS_PAGE_SIZE = 20
+
+TABLE_COLUMNS = [
+    {"name": "№", "id": "№"},
+    {"name": "Авторы", "id": "authors_fmt"},
+    {"name": "Название", "id": "title"},
+    {"name": "Год", "id": "year"},
+    {"name": "Источник", "id": "source"},
+    {"name": "Квартиль", "id": "quartile"},
+    {"name": "Процентиль 2024", "id": "percentile_2024"},
+    {"name": "Цитирования", "id": "cited_by"},
+    {"name": "DOI", "id": "doi_link"},
+    {"name": "Scopus ссылка", "id": "url"},
+]
+TABLE_COLUMNS = [c for c in TABLE_COLUMNS if c["id"] == "№" or c["id"] in df.columns]
+
+# Column positions each view reads; rows are projected onto them before building records
+TABLE_COLS = df.columns.get_indexer([c["id"] for c in TABLE_COLUMNS[1:]])
+CARDS_FIELDS = ["title", "authors_fmt", "source", "year", "quartile", "percentile_2024", "cited_by", "doi_link", "url"]
+CARDS_COLS = df.columns.get_indexer([c for c in CARDS_FIELDS if c in df.columns])
+
 # Year range
 years_nonnull = df["year"].dropna().astype(int)
 if len(years_nonnull) > 0:
@@ -109,7 +259,7 @@ app.layout = html.Div([
                      style={"marginBottom": "8px"}),
 
         html.Label("Фильтр по авторам"),
-        dcc.Dropdown(id="author_filter", options=author_options, multi=True, placeholder="Выберите авторов",
+        dcc.Dropdown(id="author_filter", options=author_options[:AUTHOR_OPTIONS_LIMIT], multi=True, placeholder="Выберите авторов",
                      style={"marginBottom": "8px"}),
 
         html.Label("Квартиль"),
@@ -162,75 +312,184 @@ app.layout = html.Div([
             dcc.Tab(label="Топ авторов", value="tab_authors"),
         ]),
         html.Div(id="tab_content", style={"padding": "16px"})
-    ], style={"marginLeft": "340px", "padding": "16px"})
+    ], style={"marginLeft": "340px", "padding": "16px"}),
+    dcc.Store(id="filtered_idx"),
 ])
 
 # ----------------------
 # Helper: filtering logic
 # ----------------------
-def apply_filters(df_in, search, year_preset, year_range, sources, authors, quartiles, percentile_range, sort_by):
-    df_f = df_in.copy()
-    max_year = df_in["year"].max() if not df_in["year"].isna().all() else year_range[1]
-
-    # Year filters
+def _year_mask(year_preset, year_range, n):
+    # Missing years are NaN and never match
     if year_preset == "last5":
-        df_f = df_f[df_f["year"].fillna(0) >= (int(max_year) - 4)]
-    elif year_preset == "last10":
-        df_f = df_f[df_f["year"].fillna(0) >= (int(max_year) - 9)]
-    elif year_range:
-        df_f = df_f[df_f["year"].between(int(year_range[0]), int(year_range[1]))]
+        return year_values >= max_year - 4
+    if year_preset == "last10":
+        return year_values >= max_year - 9
+    if year_range:
+        return (year_values >= int(year_range[0])) & (year_values <= int(year_range[1]))
+    return np.ones(n, dtype=bool)
+
+
+def _quartile_mask(quartiles, n):
+    mask = np.zeros(n, dtype=bool)
+    for q in quartiles:
+        if q in quartile_masks:
+            mask |= quartile_masks[q]
+    return mask
+
+
+def _percentile_mask(percentile_range):
+    return (percentile_values >= percentile_range[0]) & (percentile_values <= percentile_range[1])
+
+
+def _rows_mask(index, keys, n):
+    mask = np.zeros(n, dtype=bool)
+    rows = [index[k] for k in keys if k in index]
+    if rows:
+        mask[np.concatenate(rows)] = True
+    return mask
+
+
+def _authors_mask(authors, n):
+    mask = np.zeros(n, dtype=bool)
+    codes = author_names.get_indexer([a.strip() for a in authors])
+    for c in codes[codes >= 0]:
+        mask[author_rows_by_code[author_indptr[c]:author_indptr[c + 1]]] = True
+    return mask
+
+
+def _search_mask(q, n):
+    mask = np.zeros(n, dtype=bool)
+    if len(q) <= 3:
+        # Short queries are indexed as a whole: the postings are the exact answer
+        mask[search_ngrams.get(q, [])] = True
+        return mask
+
+    # Rows containing every trigram of the query are candidates; confirm them with a substring match
+    grams = {q[i:i + 3] for i in range(len(q) - 2)}
+    candidates = None
+    for gram in sorted(grams, key=lambda g: len(search_ngrams.get(g, ()))):
+        rows = search_ngrams.get(gram)
+        if rows is None:
+            return mask
+        candidates = rows if candidates is None else np.intersect1d(candidates, rows, assume_unique=True)
+        if len(candidates) == 0:
+            return mask
+    hits = pc.match_substring(search_blob.take(candidates), q).fill_null(False).to_numpy(zero_copy_only=False)
+    mask[candidates[hits]] = True
+    return mask
+
+
+# Row positions of `df` matching the filters, in display order; reads only the precomputed
+# arrays built from `df` above
+def filter_positions(search, year_preset, year_range, sources, authors, quartiles, percentile_range, sort_by):
+    n = len(df)
+    mask = _year_mask(year_preset, year_range, n)
 
     if quartiles:
-        df_f = df_f[df_f["quartile"].astype(str).isin(quartiles)]
+        mask &= _quartile_mask(quartiles, n)
 
     if percentile_range:
-        p = df_f["percentile_2024"].fillna(-1)
-        df_f = df_f[(p >= percentile_range[0]) & (p <= percentile_range[1])]
+        mask &= _percentile_mask(percentile_range)
 
     if sources:
-        df_f = df_f[df_f["source"].isin(sources)]
-
-    if authors:
-        mask_auth = df_f["authors_raw"].astype(str).apply(lambda x: any(a.strip() in x for a in authors))
-        df_f = df_f[mask_auth]
-
-    if search and str(search).strip():
-        q = str(search).lower()
-        mask = (
-            df_f["_title_lc"].str.contains(q, na=False) |
-            df_f["_authors_raw_lc"].str.contains(q, na=False) |
-            df_f["_source_lc"].str.contains(q, na=False)
-        )
-        df_f = df_f[mask]
-
-    if sort_by == "year_desc":
-        df_f = df_f.sort_values(by="year", ascending=False, na_position="last")
-    elif sort_by == "year_asc":
-        df_f = df_f.sort_values(by="year", ascending=True, na_position="last")
-    elif sort_by == "cited_desc":
-        df_f = df_f.sort_values(by="cited_by", ascending=False)
-    elif sort_by == "cited_asc":
-        df_f = df_f.sort_values(by="cited_by", ascending=True)
-    elif sort_by == "pct_desc":
-        df_f = df_f.sort_values(by="percentile_2024", ascending=False, na_position="last")
-    elif sort_by == "author_az":
-        df_f = df_f.sort_values(by="authors_raw", ascending=True)
-    elif sort_by == "author_za":
-        df_f = df_f.sort_values(by="authors_raw", ascending=False)
-    elif sort_by == "source_az":
-        df_f = df_f.sort_values(by="source", ascending=True)
-    elif sort_by == "source_za":
-        df_f = df_f.sort_values(by="source", ascending=False)
-    elif sort_by == "title_az":
-        df_f = df_f.sort_values(by="title", ascending=True)
-
-    return df_f
+        mask &= _rows_mask(source_to_rows, sources, n)
+
+    # The author and search lookups are skipped once nothing is left to match
+    if authors and mask.any():
+        mask &= _authors_mask(authors, n)
+
+    if search and str(search).strip() and mask.any():
+        # Lowercase with the same Arrow kernel as _search_blob (Python's str.lower differs, e.g. on "İ")
+        q = pc.utf8_lower(pa.scalar(str(search))).as_py()
+        mask &= _search_mask(q, n)
+
+    if not mask.any():
+        return np.empty(0, dtype=np.intp)
+
+    # Walk the precomputed order for the chosen sort and keep the rows that pass the mask
+    order = sort_orders.get(sort_by, sort_orders["year_desc"])
+    return order[mask[order]]
+
+
+@lru_cache(maxsize=32)
+def _filtered_index(search, year_preset, year_range, sources, authors, quartiles, percentile_range, sort_by):
+    idx = filter_positions(search, year_preset, year_range, sources, authors,
+                           quartiles, percentile_range, sort_by)
+    idx.flags.writeable = False
+    return idx
+
+
+# Memoized row positions of `df` matching the filters, in display order.
+# Multi-select values are sorted so the key does not depend on selection order.
+def filtered_index(search, year_preset, year_range, sources, authors, quartiles, percentile_range, sort_by):
+    return _filtered_index(search, year_preset, tuple(year_range or ()), tuple(sorted(sources or ())),
+                           tuple(sorted(authors or ())), tuple(sorted(quartiles or ())),
+                           tuple(percentile_range or ()), sort_by)
+
+
+# Positions from the filtered_idx store, minus any out of range: the browser may still hold
+# a store written before a restart with a different workbook
+def stored_positions(idx):
+    return tuple(i for i in idx or () if 0 <= i < len(df))
+
+
+# DataTable rows for one page of a filter result; numbering continues across pages
+def table_page(idx, page, page_size):
+    start = page * page_size
+    filtered_display = df.iloc[list(idx[start:start + page_size]), TABLE_COLS]
+    filtered_display.insert(0, "№", np.arange(start + 1, start + len(filtered_display) + 1, dtype=np.int32))
+    return filtered_display.to_dict("records")
+
+
+# Horizontal bar chart skeleton (layout with template, trace styling), built once per axis title
+@lru_cache(maxsize=None)
+def _bar_template(y_title):
+    import plotly.graph_objects as go
+    fig = go.Figure(go.Bar(orientation="h", marker_color="#636efa", name="", showlegend=False,
+                           hovertemplate=f"Публикаций=%{{x}}<br>{y_title}=%{{y}}<extra></extra>"),
+                    layout=go.Layout(xaxis_title="Публикаций", yaxis_title=y_title,
+                                     barmode="relative", margin={"t": 60}))
+    return fig.to_plotly_json()
+
+
+def bar_figure(x, y, y_title):
+    template = _bar_template(y_title)
+    return {"data": [{**template["data"][0], "x": x, "y": y}], "layout": template["layout"]}
+
+
+def _top20(codes, cites, n_codes):
+    # Publication and citation totals per code; top 20 by publications, ties in code order
+    pub_count = np.bincount(codes, minlength=n_codes)
+    cite_sum = np.bincount(codes, weights=cites, minlength=n_codes)
+    top = np.argsort(-pub_count, kind="stable")[:20]
+    top = top[pub_count[top] > 0]
+    return top, pub_count[top], cite_sum[top].astype(int)
+
+
+# Top-20 aggregates for a filter result, memoized on the row positions
+@lru_cache(maxsize=8)
+def top_sources(idx):
+    rows = np.asarray(idx, dtype=np.intp)
+    codes = source_codes[rows]
+    has_source = codes >= 0
+    top, pub_count, cites = _top20(codes[has_source], cited_values[rows][has_source], len(source_names))
+    return pd.DataFrame({"source": np.asarray(source_names)[top], "pub_count": pub_count, "cites": cites})
+
+
+@lru_cache(maxsize=8)
+def top_authors(idx):
+    in_filter = np.zeros(len(df), dtype=bool)
+    in_filter[list(idx)] = True
+    keep = in_filter[author_slot_rows]
+    top, pub_count, cites = _top20(author_slot_codes[keep], author_slot_cites[keep], len(author_names))
+    return pd.DataFrame({"_authors": np.asarray(author_names)[top], "pub_count": pub_count, "cites": cites})
 
 # ----------------------
 # Callbacks
 # ----------------------
 @app.callback(
-    Output("tab_content", "children"),
+    Output("filtered_idx", "data"),
     Input("apply_btn", "n_clicks"),
     State("search", "value"),
     State("preset_years", "value"),
@@ -240,36 +499,46 @@ def apply_filters(df_in, search, year_preset, year_range, sources, authors, quar
     State("quartile_filter", "value"),
     State("percentile_range", "value"),
     State("sort_by", "value"),
-    State("main_tabs", "value"),
 )
-def render_tabs(n_clicks, search, preset_years, year_range, sources, authors,
-                quartiles, percentile_range, sort_by, active_tab):
-    filtered = apply_filters(df, search, preset_years, year_range, sources, authors,
-                             quartiles, percentile_range, sort_by)
-    filtered_display = filtered.reset_index(drop=True).copy()
-    filtered_display.insert(0, "№", range(1, len(filtered_display) + 1))
-    filtered_display["authors_fmt"] = filtered_display.get("authors_raw", "").astype(str).str.replace(";", "\n")
-
-    table_columns = [
-        {"name": "№", "id": "№"},
-        {"name": "Авторы", "id": "authors_fmt"},
-        {"name": "Название", "id": "title"},
-        {"name": "Год", "id": "year"},
-        {"name": "Источник", "id": "source"},
-        {"name": "Квартиль", "id": "quartile"},
-        {"name": "Процентиль 2024", "id": "percentile_2024"},
-        {"name": "Цитирования", "id": "cited_by"},
-        {"name": "DOI", "id": "doi_link"},
-        {"name": "Scopus ссылка", "id": "url"},
-    ]
-    table_columns = [c for c in table_columns if c["id"] in filtered_display.columns]
+def update_filtered_idx(n_clicks, search, preset_years, year_range, sources, authors,
+                        quartiles, percentile_range, sort_by):
+    return filtered_index(search, preset_years, year_range, sources, authors,
+                          quartiles, percentile_range, sort_by).tolist()
+
+
+@app.callback(
+    Output("author_filter", "options"),
+    Input("author_filter", "search_value"),
+    State("author_filter", "value"),
+    prevent_initial_call=True,
+)
+def search_author_options(search_value, selected):
+    # Selected authors must stay in the options, otherwise the dropdown drops them
+    selected = set(selected or ())
+    q = (search_value or "").strip().lower()
+    matches = [o for o, v in zip(author_options, author_values_lc) if q in v and o["value"] not in selected]
+    return [o for o in author_options if o["value"] in selected] + matches[:AUTHOR_OPTIONS_LIMIT]
+
+
+@app.callback(
+    Output("tab_content", "children"),
+    Input("filtered_idx", "data"),
+    Input("main_tabs", "value"),
+)
+def render_tabs(idx, active_tab):
+    idx = stored_positions(idx)
 
     # Таблица
     if active_tab == "tab_table":
+        from dash import dash_table
         return dash_table.DataTable(
-            columns=table_columns,
-            data=filtered_display.to_dict("records"),
-            page_size=20,
+            id="results_table",
+            columns=TABLE_COLUMNS,
+            data=table_page(idx, 0, TABLE_PAGE_SIZE),
+            page_action="custom",
+            page_current=0,
+            page_size=TABLE_PAGE_SIZE,
+            page_count=max(1, -(-len(idx) // TABLE_PAGE_SIZE)),
             style_cell={"whiteSpace": "pre-line", "textAlign": "left"},
             style_header={"backgroundColor": "#0D1B2A", "color": "white", "fontWeight": "bold"},
             style_table={"overflowX": "auto"},
@@ -277,71 +546,98 @@ def render_tabs(n_clicks, search, preset_years, year_range, sources, authors,
 
     # Scopus-вид
     if active_tab == "tab_cards":
-        cards = []
-        for _, row in filtered_display.iterrows():
-            cards.append(html.Div([
-                html.H4(f"{row['№']}. {row['title']}"),
-                html.Pre(f"Авторы:\n{row['authors_fmt']}"),
-                html.Div(f"Источник: {row['source']} | Год: {row['year']} | Квартиль: {row['quartile']} | Процентиль: {row['percentile_2024']}"),
-                html.Div(f"Цитирования: {row['cited_by']}"),
-                html.A("DOI", href=row["doi_link"], target="_blank") if row.get("doi_link") else None,
-                html.Br(),
-                html.A("Scopus", href=row["url"], target="_blank") if row.get("url") else None,
-                html.Hr()
-            ], style={"marginBottom": "12px"}))
-        return html.Div(cards)
+        n_pages = max(1, -(-len(idx) // CARDS_PAGE_SIZE))
+        return html.Div([
+            html.Div(["Страница ",
+                      dcc.Input(id="cards_page", type="number", min=1, max=n_pages, step=1, value=1,
+                                style={"width": "70px"}),
+                      f" из {n_pages}"], style={"marginBottom": "12px"}),
+            html.Div(id="cards_list"),
+        ])
 
     # Топ источников
     if active_tab == "tab_sources":
-        top_sources = (filtered.groupby("source")
-                       .agg(pub_count=("title", "count"), cites=("cited_by", "sum"))
-                       .sort_values("pub_count", ascending=False).reset_index())
-        fig = px.bar(top_sources.head(20), x="pub_count", y="source", orientation="h",
-                     labels={"pub_count": "Публикаций", "source": "Источник"})
-        return dcc.Graph(figure=fig)
+        top = top_sources(idx)
+        return dcc.Graph(figure=bar_figure(top["pub_count"].to_numpy(), top["source"].to_numpy(), "Источник"))
 
     # Топ авторов
     if active_tab == "tab_authors":
-        exploded = (filtered.assign(_authors=filtered["authors_raw"].astype(str).str.split(";"))
-                    .explode("_authors"))
-        exploded["_authors"] = exploded["_authors"].str.strip()
-        top_authors = (exploded[exploded["_authors"] != ""]
-                       .groupby("_authors").agg(pub_count=("title", "count"), cites=("cited_by", "sum"))
-                       .sort_values("pub_count", ascending=False).reset_index())
-        fig2 = px.bar(top_authors.head(20), x="pub_count", y="_authors", orientation="h",
-                      labels={"pub_count": "Публикаций", "_authors": "Автор"})
-        return dcc.Graph(figure=fig2)
+        top = top_authors(idx)
+        return dcc.Graph(figure=bar_figure(top["pub_count"].to_numpy(), top["_authors"].to_numpy(), "Автор"))
 
     return html.Div("Нет данных")
 
+@app.callback(
+    Output("results_table", "data"),
+    Input("results_table", "page_current"),
+    State("results_table", "page_size"),
+    State("filtered_idx", "data"),
+    prevent_initial_call=True,
+)
+def page_table(page_current, page_size, idx):
+    return table_page(stored_positions(idx), page_current or 0, page_size or TABLE_PAGE_SIZE)
+
+
+@app.callback(
+    Output("cards_list", "children"),
+    Input("cards_page", "value"),
+    State("filtered_idx", "data"),
+)
+def render_cards(page, idx):
+    idx = list(stored_positions(idx))
+    n_pages = max(1, -(-len(idx) // CARDS_PAGE_SIZE))
+    start = (min(max(int(page or 1), 1), n_pages) - 1) * CARDS_PAGE_SIZE
+    rows = df.iloc[idx[start:start + CARDS_PAGE_SIZE], CARDS_COLS]
+    cards = [
+        html.Div([
+            html.H4(f"{n}. {title}"),
+            html.Pre(f"Авторы:\n{authors_fmt}"),
+            html.Div(f"Источник: {source} | Год: {year} | Квартиль: {quartile} | Процентиль: {pct}"),
+            html.Div(f"Цитирования: {cited_by}"),
+            html.A("DOI", href=doi_link, target="_blank") if pd.notna(doi_link) else None,
+            html.Br(),
+            html.A("Scopus", href=url, target="_blank") if pd.notna(url) else None,
+            html.Hr()
+        ], style={"marginBottom": "12px"})
+        for n, (title, authors_fmt, source, year, quartile, pct, cited_by, doi_link, url) in enumerate(
+            zip(*(rows[c].to_numpy() if c in rows.columns else np.full(len(rows), None) for c in CARDS_FIELDS)),
+            start=start + 1)
+    ]
+    return html.Div(cards)
+
 # ----------------------
 
+def write_xlsx(frame, buf):
+    # constant_memory flushes every finished row, so rows are written strictly in order
+    # (DataFrame.to_excel writes column by column and would lose cells in this mode)
+    wb = xlsxwriter.Workbook(buf, {"constant_memory": True, "strings_to_formulas": False, "strings_to_urls": False})
+    ws = wb.add_worksheet("Sheet1")
+    ws.write_row(0, 0, list(frame.columns))
+    for r, row in enumerate(frame.astype(object).where(frame.notna(), None).itertuples(index=False, name=None), start=1):
+        ws.write_row(r, 0, row)
+    wb.close()
+
+
 @app.callback(
     Output("download-dataframe", "data"),
     Input("export_csv", "n_clicks"),
     Input("export_xlsx", "n_clicks"),
-    State("search", "value"),
-    State("preset_years", "value"),
-    State("year_range", "value"),
-    State("source_filter", "value"),
-    State("author_filter", "value"),
-    State("quartile_filter", "value"),
-    State("percentile_range", "value"),
-    State("sort_by", "value"),
+    State("filtered_idx", "data"),
     prevent_initial_call=True
 )
-def export_data(n_csv, n_xlsx, search, preset_years, year_range, sources, authors,
-                quartiles, percentile_range, sort_by):
-    filtered = apply_filters(df, search, preset_years, year_range, sources, authors,
-                             quartiles, percentile_range, sort_by)
-    filtered = filtered.reset_index(drop=True)
-    filtered.insert(0, "№", range(1, len(filtered) + 1))
+def export_data(n_csv, n_xlsx, idx):
+    # Export exactly the rows on screen: reuse the positions computed by update_filtered_idx
+    idx = list(stored_positions(idx))
+    filtered = df.iloc[idx].drop(columns=[c for c in df.columns if c.startswith("_")])
+    filtered.insert(0, "№", np.arange(1, len(filtered) + 1, dtype=np.int32))
 
     trigger_id = ctx.triggered_id
     if trigger_id == "export_csv":
-        return dcc.send_data_frame(filtered.to_csv, f"Zh_Scopus_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv", index=False)
+        buf = pa.BufferOutputStream()
+        pa_csv.write_csv(pa.Table.from_pandas(filtered, preserve_index=False), buf)
+        return dcc.send_bytes(buf.getvalue().to_pybytes(), f"Zh_Scopus_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv")
     elif trigger_id == "export_xlsx":
-        return dcc.send_data_frame(filtered.to_excel, f"Zh_Scopus_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx", index=False, engine="openpyxl")
+        return dcc.send_bytes(lambda buf: write_xlsx(filtered, buf), f"Zh_Scopus_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx")
 
 if __name__ == "__main__":
     app.run_server(debug=True)